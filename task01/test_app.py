@@ -1,5 +1,7 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List
 
 # Конфигурация страницы
@@ -9,6 +11,32 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def create_session() -> requests.Session:
+    """Сессия с расширенным пулом соединений и повторами временных ошибок"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=50,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            respect_retry_after_header=True,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"])
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Одна сессия на всё приложение: cache_resource переживает повторные
+# прогоны скрипта Streamlit, иначе пул соединений пересоздавался бы на каждое действие
+session = create_session()
+
+# Таймауты запросов (connect, read): быстро падаем вместо бесконечного ожидания
+REQUEST_TIMEOUT = (3.05, 15)
+
 # Заголовок
 st.title("🏢 Тестирование API Единого окна")
 st.markdown("---")
@@ -31,7 +59,7 @@ with st.sidebar:
 def get_departments() -> List[str]:
     """Получение списка департаментов"""
     try:
-        response = requests.get("http://localhost:8000/departments")
+        response = session.get("http://localhost:8000/departments", timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.json()["departments"]
     except Exception as e:
@@ -41,9 +69,10 @@ def get_departments() -> List[str]:
 def process_appeal(text: str, contact_info: str) -> dict:
     """Отправка обращения на обработку"""
     try:
-        response = requests.post(
+        response = session.post(
             "http://localhost:8000/process_appeal",
-            json={"text": text, "contact_info": contact_info}
+            json={"text": text, "contact_info": contact_info},
+            timeout=REQUEST_TIMEOUT
         )
         if response.status_code == 400:
             st.warning(response.json().get("detail", "Не удалось определить департамент. Попробуйте переформулировать обращение."))
@@ -1,17 +1,43 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 from typing import Optional, Dict, Any
 import sys
 from datetime import datetime
 
+# Таймауты запросов (connect, read): быстро падаем вместо бесконечного ожидания
+REQUEST_TIMEOUT = (3.05, 15)
+
+
+def create_session() -> requests.Session:
+    """Сессия с расширенным пулом соединений и повторами временных ошибок"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=50,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            respect_retry_after_header=True,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"])
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 class ConsoleTester:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
+        # Переиспользуем соединения (keep-alive) вместо нового TCP-рукопожатия на каждый запрос
+        self.session = create_session()
 
     def get_departments(self) -> Optional[list]:
         """Получение списка департаментов"""
         try:
-            response = requests.get(f"{self.base_url}/departments")
+            response = self.session.get(f"{self.base_url}/departments", timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()["departments"]
         except Exception as e:
@@ -21,9 +47,10 @@ class ConsoleTester:
     def process_appeal(self, text: str, contact_info: str, theme: str) -> Optional[Dict[str, Any]]:
         """Отправка обращения на обработку"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/process_appeal",
-                json={"text": text, "contact_info": contact_info}
+                json={"text": text, "contact_info": contact_info},
+                timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 400:
@@ -86,7 +113,7 @@ class ConsoleTester:
                     print(f"Тема: {result['theme']}")
                     print(f"Департамент: {result['department']}")
                     print("\nПолные данные:")
-                    print(json.dumps(result, indent=2, ensure_ascii=False))
+                    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
 
             elif choice == "2":
                 print("\n=== Список департаментов ===")
@@ -1,23 +1,49 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 from typing import Optional, Dict, Any
 import sys
 from datetime import datetime
 import os
 
+# Таймауты запросов (connect, read): быстро падаем вместо бесконечного ожидания
+REQUEST_TIMEOUT = (3.05, 15)
+
+
+def create_session() -> requests.Session:
+    """Сессия с расширенным пулом соединений и повторами временных ошибок"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=50,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            respect_retry_after_header=True,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"])
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 class ConsoleTester:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
+        # Переиспользуем соединения (keep-alive) вместо нового TCP-рукопожатия на каждый запрос
+        self.session = create_session()
 
-    def save_appeal_to_file(self, data: Dict[str, Any]) -> Optional[str]:
+    def save_appeal_to_file(self, data: Dict[str, Any], now: datetime) -> Optional[str]:
         """Сохранение обращения в JSON файл"""
         try:
             # Создаем имя файла на основе даты и темы
-            filename = f"appeal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            filename = f"appeal_{now.strftime('%Y%m%d_%H%M%S')}.json"
             
-            # Сохраняем файл
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # Сохраняем файл (orjson пишет UTF-8 без экранирования кириллицы)
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
             
             return filename
         except Exception as e:
@@ -27,19 +53,20 @@ class ConsoleTester:
     def get_departments(self) -> Optional[list]:
         """Получение списка департаментов"""
         try:
-            response = requests.get(f"{self.base_url}/departments")
+            response = self.session.get(f"{self.base_url}/departments", timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()["departments"]
         except Exception as e:
             print(f"❌ Ошибка при получении списка департаментов: {str(e)}")
             return None
 
-    def process_appeal(self, text: str, contact_info: str, theme: str) -> Optional[Dict[str, Any]]:
+    def process_appeal(self, text: str, contact_info: str, theme: str, now: datetime) -> Optional[Dict[str, Any]]:
         """Отправка обращения на обработку"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/process_appeal",
-                json={"text": text, "contact_info": contact_info}
+                json={"text": text, "contact_info": contact_info},
+                timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 400:
@@ -51,7 +78,7 @@ class ConsoleTester:
             
             # Добавляем дополнительные поля
             result.update({
-                "date": datetime.now().strftime("%d.%m.%Y %H:%M"),
+                "date": now.strftime("%d.%m.%Y %H:%M"),
                 "theme": theme,
                 "department": result.get("department", "Не определен"),
                 "text": text,
@@ -95,7 +122,10 @@ class ConsoleTester:
                     continue
 
                 print("\nОтправка обращения...")
-                result = self.process_appeal(text, contact_info, theme)
+                # Один момент времени на всё обращение: дата в данных
+                # и отметка в имени файла не расходятся
+                now = datetime.now()
+                result = self.process_appeal(text, contact_info, theme, now)
                 
                 if result:
                     print("\n✅ Обращение успешно обработано!")
@@ -105,12 +135,12 @@ class ConsoleTester:
                     print(f"Департамент: {result['department']}")
                     
                     # Сохраняем в файл
-                    filename = self.save_appeal_to_file(result)
+                    filename = self.save_appeal_to_file(result, now)
                     if filename:
                         print(f"\n✅ Данные сохранены в файл: {filename}")
                     
                     print("\nПолные данные:")
-                    print(json.dumps(result, indent=2, ensure_ascii=False))
+                    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
 
             elif choice == "2":
                 print("\n=== Список департаментов ===")
@@ -1,11 +1,22 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from models import HuggingFaceClassifier
+from starlette.concurrency import run_in_threadpool
+from models import HuggingFaceClassifier, close_http_client
+
+# Параметры микро-батчинга: сколько запросов собирать в один проход модели
+# и сколько миллисекунд ждать добора батча
+MAX_BATCH = 16
+MAX_WAIT_MS = 10
 
 app = FastAPI(
     title="Единое окно",
     description="API для обработки обращений граждан и их направления в соответствующие департаменты",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson сериализует ответы заметно быстрее стандартного json
+    default_response_class=ORJSONResponse
 )
 
 # Модель для входящего обращения
@@ -23,17 +34,63 @@ DEPARTMENTS = [
     "Департамент физической культуры и спорта"
 ]
 
-# Инициализация классификатора
-classifier = HuggingFaceClassifier()
+async def process_appeal_batches():
+    """
+    Фоновая задача микро-батчинга: собирает конкурентные запросы из очереди
+    (до MAX_BATCH штук или MAX_WAIT_MS мс) и классифицирует их одним проходом модели
+    """
+    queue = app.state.appeal_queue
+    classifier = app.state.classifier
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + MAX_WAIT_MS / 1000
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        texts = [text for text, _ in batch]
+        try:
+            departments = await run_in_threadpool(classifier.classify_batch, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        for (_, future), department in zip(batch, departments):
+            if not future.done():
+                future.set_result(department)
+
+@app.on_event("startup")
+async def init_classifier():
+    # Инициализация классификатора при старте воркера, а не при импорте модуля:
+    # набор департаментов фиксируется один раз, их эмбеддинги вычисляются здесь
+    app.state.classifier = HuggingFaceClassifier(departments=DEPARTMENTS)
+    app.state.appeal_queue = asyncio.Queue()
+    app.state.batch_task = asyncio.create_task(process_appeal_batches())
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    # Останавливаем батчер и корректно закрываем общий HTTP-клиент внешних LLM API
+    app.state.batch_task.cancel()
+    await close_http_client()
 
 @app.post("/process_appeal", 
     response_model=dict,
     summary="Обработать обращение гражданина",
     description="Принимает текст обращения и контактную информацию, определяет соответствующий департамент")
-async def process_appeal(appeal: Appeal):
+async def process_appeal(appeal: Appeal, request: Request):
     try:
-        # Определение департамента
-        department = classifier.classify(appeal.text, DEPARTMENTS)
+        # Определение департамента: запрос попадает в очередь микро-батчинга,
+        # результат приходит через future после общего прогона модели
+        future = asyncio.get_running_loop().create_future()
+        await request.app.state.appeal_queue.put((appeal.text, future))
+        department = await future
         if not department:
             raise HTTPException(
                 status_code=400,
@@ -1,47 +1,152 @@
 from abc import ABC, abstractmethod
 import os
-import requests
+import httpx
 import json
-from typing import List
+import hashlib
+import asyncio
+import functools
+import random
+import time
+from collections import Counter, OrderedDict
+from typing import List, Optional
 from fastapi import HTTPException
 from transformers import pipeline, AutoTokenizer, AutoModel
 import logging
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import torch
+import torch.nn.functional as F
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Общий асинхронный HTTP-клиент для обращений к внешним LLM API
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Возвращает общий httpx.AsyncClient (создаётся при первом обращении)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        # Явные таймауты: зависший внешний API не должен держать воркер бесконечно.
+        # Расширенный пул соединений и повторы на уровне транспорта — для пиковой нагрузки
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0, connect=3.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            transport=httpx.AsyncHTTPTransport(retries=3)
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """Закрывает общий HTTP-клиент (вызывается при остановке приложения)"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+
+# HTTP-статусы, при которых имеет смысл повторить запрос
+RETRIABLE_STATUSES = (429, 502, 503, 504)
+
+# Общий шаблон промпта для всех LLM-классификаторов
+PROMPT_TEMPLATE = """
+        Проанализируй следующее обращение гражданина и определи, в какой департамент его нужно направить.
+        Доступные департаменты: {departments}
+
+        Обращение: {text}
+
+        Ответь только названием департамента из списка.
+        """
+
+@functools.lru_cache(maxsize=8)
+def _join_departments(departments: tuple) -> str:
+    """Кэширует строку со списком департаментов (набор практически не меняется)"""
+    return ", ".join(departments)
+
+def build_prompt(text: str, departments: List[str]) -> str:
+    """Собирает промпт классификации для LLM API"""
+    return PROMPT_TEMPLATE.format(departments=_join_departments(tuple(departments)), text=text)
+
+class CircuitBreaker:
+    """
+    Простой circuit breaker для внешних LLM API.
+
+    Пока число подряд идущих неудач меньше порога, запросы проходят.
+    После порога запросы сразу отклоняются, а по истечении reset_timeout
+    пропускается один пробный запрос; его успех закрывает breaker.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас выполнять запрос"""
+        if self._failures < self.failure_threshold:
+            return True
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+async def post_with_retry(client: httpx.AsyncClient, url: str, breaker: CircuitBreaker,
+                          max_attempts: int = 4, **kwargs) -> httpx.Response:
+    """
+    POST с повторами по временным ошибкам (экспоненциальная задержка
+    со случайным джиттером) под контролем circuit breaker-а
+    """
+    if not breaker.allow_request():
+        raise HTTPException(
+            status_code=503,
+            detail="Внешний API временно недоступен (circuit breaker открыт)"
+        )
+
+    for attempt in range(max_attempts):
+        try:
+            response = await client.post(url, **kwargs)
+            response.raise_for_status()
+            breaker.record_success()
+            return response
+        except httpx.HTTPError as e:
+            retriable = isinstance(e, httpx.TransportError) or (
+                isinstance(e, httpx.HTTPStatusError)
+                and e.response.status_code in RETRIABLE_STATUSES
+            )
+            if not retriable or attempt == max_attempts - 1:
+                breaker.record_failure()
+                raise
+            delay = random.uniform(0, 0.5 * (2 ** attempt))
+            logger.warning(f"Повтор запроса к {url} через {delay:.2f} с: {str(e)}")
+            await asyncio.sleep(delay)
+
 class BaseModel(ABC):
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key
+        self.client = client or get_http_client()
+        self.breaker = CircuitBreaker()
 
     @abstractmethod
-    def classify(self, text: str, departments: List[str]) -> str:
+    async def classify(self, text: str, departments: List[str]) -> str:
         pass
 
 class DeepSeekClassifier:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key
+        self.client = client or get_http_client()
+        self.breaker = CircuitBreaker()
         self.url = "https://api.deepseek.com/v1/chat/completions"
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
 
-    def classify(self, text: str, departments: List[str]) -> str:
+    async def classify(self, text: str, departments: List[str]) -> str:
         """
         Классифицирует обращение гражданина и определяет соответствующий департамент
         """
-        prompt = f"""
-        Проанализируй следующее обращение гражданина и определи, в какой департамент его нужно направить.
-        Доступные департаменты: {', '.join(departments)}
-        
-        Обращение: {text}
-        
-        Ответь только названием департамента из списка.
-        """
+        prompt = build_prompt(text, departments)
         
         data = {
             "model": "deepseek-chat",
@@ -60,11 +165,11 @@ class DeepSeekClassifier:
         }
         
         try:
-            response = requests.post(self.url, headers=self.headers, json=data)
-            response.raise_for_status()
+            response = await post_with_retry(self.client, self.url, self.breaker,
+                                             headers=self.headers, json=data)
             result = response.json()
             return result["choices"][0]["message"]["content"].strip()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Ошибка при обращении к DeepSeek API: {str(e)}"
@@ -76,21 +181,14 @@ class DeepSeekClassifier:
             )
 
 class QwenModel(BaseModel):
-    def classify(self, text: str, departments: List[str]) -> str:
+    async def classify(self, text: str, departments: List[str]) -> str:
         url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        prompt = f"""
-        Проанализируй следующее обращение гражданина и определи, в какой департамент его нужно направить.
-        Доступные департаменты: {', '.join(departments)}
-        
-        Обращение: {text}
-        
-        Ответь только названием департамента из списка.
-        """
+        prompt = build_prompt(text, departments)
         
         data = {
             "model": "qwen-turbo",
@@ -107,29 +205,24 @@ class QwenModel(BaseModel):
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
+            response = await post_with_retry(self.client, url, self.breaker,
+                                             headers=headers, json=data)
             result = response.json()
             return result["output"]["text"].strip()
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Ошибка Qwen: {str(e)}")
 
 class YandexGPTModel(BaseModel):
-    def classify(self, text: str, departments: List[str]) -> str:
+    async def classify(self, text: str, departments: List[str]) -> str:
         url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Api-Key {self.api_key}"
         }
         
-        prompt = f"""
-        Проанализируй следующее обращение гражданина и определи, в какой департамент его нужно направить.
-        Доступные департаменты: {', '.join(departments)}
-        
-        Обращение: {text}
-        
-        Ответь только названием департамента из списка.
-        """
+        prompt = build_prompt(text, departments)
         
         data = {
             "modelUri": "gpt://b1gqs0e2qom8vq2a5q6s/yandexgpt-lite",
@@ -151,20 +244,127 @@ class YandexGPTModel(BaseModel):
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
+            response = await post_with_retry(self.client, url, self.breaker,
+                                             headers=headers, json=data)
             result = response.json()
             return result["result"]["alternatives"][0]["message"]["text"].strip()
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Ошибка YandexGPT: {str(e)}")
 
 class HuggingFaceClassifier:
-    def __init__(self):
+    # Фиксированные длины паддинга: ограничиваем число форм входа,
+    # чтобы torch.compile / onnxruntime не перекомпилировали ядра под каждую новую длину
+    pad_buckets = (64, 128, 256, 512)
+
+    # Основы ключевых слов, характерных для департаментов: дешёвый фильтр,
+    # позволяющий не запускать модель на однозначных обращениях
+    keyword_rules = {
+        "Департамент транспорта": (
+            "автобус", "трамва", "метро", "троллейбус", "светофор", "парковк",
+            "остановк", "дорожн", "ремонт дорог", "такси", "велодорожк"
+        ),
+        "Департамент культуры": (
+            "музе", "театр", "библиотек", "выставк", "концерт", "фестивал",
+            "памятник", "культурн"
+        ),
+        "Департамент здравоохранения": (
+            "больниц", "поликлиник", "аптек", "врач", "медицинск", "вакцин",
+            "диспансер"
+        ),
+        "Департамент образования": (
+            "школ", "детский сад", "детсад", "университет", "колледж", "учител",
+            "образовательн"
+        ),
+        "Департамент экологии": (
+            "мусор", "свалк", "озеленен", "эколог", "отход", "загрязнен"
+        ),
+        "Департамент физической культуры и спорта": (
+            "стадион", "спортивн", "бассейн", "физкультур", "тренировк",
+            "соревнован"
+        ),
+    }
+
+    # Описания департаментов
+    department_descriptions = {
+        "Департамент транспорта": """
+            Отвечает за транспортную инфраструктуру, дороги, общественный транспорт,
+            парковки, светофоры, дорожные знаки, ремонт дорог, транспортные развязки,
+            мосты, туннели, велодорожки, остановки, автобусы, трамваи, метро, такси.
+        """,
+        "Департамент культуры": """
+            Отвечает за музеи, театры, библиотеки, культурные центры, выставки,
+            концерты, фестивали, парки культуры, художественные студии, творческие
+            кружки, культурные мероприятия, памятники, исторические здания,
+            культурное наследие, искусство, музыку, литературу.
+        """,
+        "Департамент здравоохранения": """
+            Отвечает за больницы, поликлиники, медицинские центры, аптеки,
+            медицинское обслуживание, здоровье населения, профилактику заболеваний,
+            медицинские услуги, врачей, медсестер, медицинское оборудование,
+            вакцинацию, диспансеризацию.
+        """,
+        "Департамент образования": """
+            Отвечает за школы, детские сады, университеты, колледжи, образовательные
+            программы, учебные заведения, образование детей и взрослых, курсы,
+            обучение, преподавателей, учебные материалы, образовательные стандарты.
+        """,
+        "Департамент экологии": """
+            Отвечает за охрану окружающей среды, уборку мусора, озеленение,
+            экологические программы, чистоту города, переработку отходов,
+            экологическое образование, защиту природы, экологические нормы,
+            мониторинг окружающей среды.
+        """,
+        "Департамент физической культуры и спорта": """
+            Отвечает за спортивные объекты, стадионы, спортивные площадки,
+            бассейны, спортивные секции, физкультуру, спортивные мероприятия,
+            соревнования, тренировки, развитие спорта, спортивные программы.
+        """
+    }
+
+    def __init__(self, departments: Optional[List[str]] = None):
         self.model_name = "sberbank-ai/sbert_large_nlu_ru"
+        # Фиксируем набор департаментов на старте процесса: путь запроса
+        # работает только с заранее вычисленной матрицей эмбеддингов
+        self.department_names = tuple(departments) if departments else tuple(self.department_descriptions)
         try:
             logger.info(f"Инициализация модели {self.model_name}")
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
+            # Если задан путь к ONNX-модели (экспортируется заранее через export_onnx),
+            # используем onnxruntime с int8-квантованием вместо PyTorch
+            self.onnx_session = None
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            onnx_path = os.getenv("SBERT_ONNX_PATH", "")
+            if onnx_path and os.path.exists(onnx_path):
+                import onnxruntime as ort
+                providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] \
+                    if self.device == "cuda" else ["CPUExecutionProvider"]
+                self.onnx_session = ort.InferenceSession(onnx_path, providers=providers)
+                logger.info(f"Используется ONNX-модель: {onnx_path}")
+            else:
+                # Загружаем веса в половинной точности: вдвое меньше памяти
+                # и заметно быстрее прямой проход (FP16 на CUDA, BF16 на CPU)
+                dtype = torch.float16 if self.device == "cuda" else torch.bfloat16
+                self.model = AutoModel.from_pretrained(self.model_name, torch_dtype=dtype)
+                self.model = self.model.eval().to(self.device)
+                if self.device == "cuda":
+                    torch.backends.cuda.matmul.allow_tf32 = True
+                # Компилируем модель: фьюжн ядер и снятие оверхеда Python-диспетчеризации.
+                # torch.compile ленивый — ошибки бэкенда всплывают только на первом
+                # прогоне, поэтому прогреваем здесь и при неудаче остаёмся в eager-режиме
+                if hasattr(torch, "compile"):
+                    eager_model = self.model
+                    try:
+                        compiled_model = torch.compile(self.model, fullgraph=False)
+                        warmup = self.tokenizer("пример обращения гражданина", return_tensors="pt")
+                        warmup = {key: tensor.to(self.device) for key, tensor in warmup.items()}
+                        with torch.inference_mode():
+                            compiled_model(**warmup)
+                        self.model = compiled_model
+                    except Exception as compile_error:
+                        self.model = eager_model
+                        logger.warning(f"torch.compile недоступен, работаем в eager-режиме: {str(compile_error)}")
             logger.info("Модель успешно инициализирована")
         except Exception as e:
             logger.error(f"Ошибка при инициализации модели: {str(e)}")
@@ -173,92 +373,142 @@ class HuggingFaceClassifier:
                 detail=f"Ошибка при инициализации модели: {str(e)}"
             )
 
-    def get_embedding(self, text: str) -> np.ndarray:
-        """Получение эмбеддинга текста"""
-        inputs = self.tokenizer(text, padding=True, truncation=True, max_length=512, return_tensors="pt")
-        with torch.no_grad():
+        # Предварительно вычисляем эмбеддинги описаний департаментов одним батчем,
+        # чтобы на каждый запрос оставался только один проход модели по тексту обращения
+        dept_matrix = self.get_embeddings_batch(
+            [self.department_descriptions[name] for name in self.department_names]
+        )
+        # L2-нормализация строк для вычисления косинусного сходства;
+        # матрица остаётся на устройстве модели
+        self.dept_matrix = F.normalize(dept_matrix, dim=1)
+
+        # Двухуровневый кэш результатов: точное совпадение по sha1 текста
+        # и семантический уровень по близости эмбеддингов уже обработанных обращений
+        self.cache_max_size = 1024
+        self.semantic_threshold = 0.95
+        self._exact_cache = OrderedDict()
+        self._cache_embs = torch.empty((0, self.dept_matrix.shape[1]),
+                                       dtype=torch.float32, device=self.dept_matrix.device)
+        self._cache_depts = []
+
+        # Мемоизация эмбеддингов повторяющихся текстов (ретраи, тесты);
+        # кэш привязан к экземпляру, чтобы не держать self в глобальном lru_cache
+        self._embed_cached = functools.lru_cache(maxsize=1024)(self._embed_uncached)
+
+        # Ключевые слова только активных департаментов
+        self._keyword_map = {
+            stem: dept
+            for dept, stems in self.keyword_rules.items()
+            if dept in self.department_names
+            for stem in stems
+        }
+
+    def _classify_by_keywords(self, text: str) -> Optional[str]:
+        """
+        Классификация по ключевым словам; возвращает департамент только
+        при явном лидере (минимум два совпадения и отрыв от второго места)
+        """
+        lowered = text.lower()
+        hits = Counter()
+        for stem, dept in self._keyword_map.items():
+            count = lowered.count(stem)
+            if count:
+                hits[dept] += count
+        if not hits:
+            return None
+        ranked = hits.most_common(2)
+        best_dept, best_count = ranked[0]
+        second_count = ranked[1][1] if len(ranked) > 1 else 0
+        if best_count >= 2 and best_count - second_count >= 2:
+            return best_dept
+        return None
+
+    def _cache_result(self, key: str, query_embedding: torch.Tensor, department: str) -> None:
+        """Сохраняет результат классификации в оба уровня кэша (с ограничением размера)"""
+        self._exact_cache[key] = department
+        if len(self._exact_cache) > self.cache_max_size:
+            self._exact_cache.popitem(last=False)
+        self._cache_embs = torch.cat(
+            [self._cache_embs, query_embedding.reshape(1, -1)]
+        )[-self.cache_max_size:]
+        self._cache_depts = (self._cache_depts + [department])[-self.cache_max_size:]
+
+    def _embed_uncached(self, text: str) -> torch.Tensor:
+        return self.get_embeddings_batch([text])
+
+    def get_embedding(self, text: str) -> torch.Tensor:
+        """Получение эмбеддинга текста (с мемоизацией повторяющихся текстов)"""
+        # Очень длинные тексты не кэшируем, чтобы не раздувать память
+        if len(text) > 2048:
+            return self._embed_uncached(text)
+        return self._embed_cached(text)
+
+    def _tokenize(self, texts: List[str], return_tensors: str):
+        """Токенизация с паддингом до ближайшей фиксированной длины"""
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=512,
+                                 return_tensors=return_tensors)
+        length = int(encoded["input_ids"].shape[1])
+        bucket = next(b for b in self.pad_buckets if length <= b)
+        if length == bucket:
+            return encoded
+        return self.tokenizer(texts, padding="max_length", truncation=True, max_length=bucket,
+                              return_tensors=return_tensors)
+
+    def get_embeddings_batch(self, texts: List[str]) -> torch.Tensor:
+        """
+        Получение эмбеддингов нескольких текстов за один проход модели.
+        Результат — FP32-тензор, остающийся на устройстве модели
+        """
+        if self.onnx_session is not None:
+            inputs = self._tokenize(texts, return_tensors="np")
+            feeds = {
+                node.name: inputs[node.name].astype(np.int64)
+                for node in self.onnx_session.get_inputs()
+            }
+            hidden = self.onnx_session.run(None, feeds)[0].astype(np.float32)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / mask.sum(axis=1)
+            return torch.from_numpy(pooled)
+
+        inputs = self._tokenize(texts, return_tensors="pt")
+        inputs = {key: tensor.to(self.device) for key, tensor in inputs.items()}
+        with torch.inference_mode():
             outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).numpy()
+        # Усреднение по маске внимания в FP32, чтобы паддинг и половинная
+        # точность не искажали эмбеддинги
+        hidden = outputs.last_hidden_state.float()
+        mask = inputs["attention_mask"].unsqueeze(-1).float()
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1)
 
-    def classify(self, text: str, departments: List[str]) -> str:
+    def classify(self, text: str) -> Optional[str]:
         """
         Классифицирует обращение гражданина и определяет соответствующий департамент
-        
+
         Args:
             text (str): Текст обращения
-            departments (List[str]): Список доступных департаментов
-            
+
         Returns:
             str: Название выбранного департамента или None, если не удалось определить
         """
         logger.info(f"Начало классификации текста: {text[:100]}...")
 
-        # Описания департаментов
-        department_descriptions = {
-            "Департамент транспорта": """
-                Отвечает за транспортную инфраструктуру, дороги, общественный транспорт, 
-                парковки, светофоры, дорожные знаки, ремонт дорог, транспортные развязки, 
-                мосты, туннели, велодорожки, остановки, автобусы, трамваи, метро, такси.
-            """,
-            "Департамент культуры": """
-                Отвечает за музеи, театры, библиотеки, культурные центры, выставки, 
-                концерты, фестивали, парки культуры, художественные студии, творческие 
-                кружки, культурные мероприятия, памятники, исторические здания, 
-                культурное наследие, искусство, музыку, литературу.
-            """,
-            "Департамент здравоохранения": """
-                Отвечает за больницы, поликлиники, медицинские центры, аптеки, 
-                медицинское обслуживание, здоровье населения, профилактику заболеваний, 
-                медицинские услуги, врачей, медсестер, медицинское оборудование, 
-                вакцинацию, диспансеризацию.
-            """,
-            "Департамент образования": """
-                Отвечает за школы, детские сады, университеты, колледжи, образовательные 
-                программы, учебные заведения, образование детей и взрослых, курсы, 
-                обучение, преподавателей, учебные материалы, образовательные стандарты.
-            """,
-            "Департамент экологии": """
-                Отвечает за охрану окружающей среды, уборку мусора, озеленение, 
-                экологические программы, чистоту города, переработку отходов, 
-                экологическое образование, защиту природы, экологические нормы, 
-                мониторинг окружающей среды.
-            """,
-            "Департамент физической культуры и спорта": """
-                Отвечает за спортивные объекты, стадионы, спортивные площадки, 
-                бассейны, спортивные секции, физкультуру, спортивные мероприятия, 
-                соревнования, тренировки, развитие спорта, спортивные программы.
-            """
-        }
+        # Первый уровень кэша: точное совпадение текста
+        cache_key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if cache_key in self._exact_cache:
+            department = self._exact_cache[cache_key]
+            logger.info(f"Кэш (точное совпадение): {department}")
+            return department
+
+        # Быстрый фильтр: однозначные ключевые слова избавляют от прогона модели
+        department = self._classify_by_keywords(text)
+        if department:
+            logger.info(f"Классификация по ключевым словам: {department}")
+            return department
 
         try:
             # Получаем эмбеддинг входного текста
             text_embedding = self.get_embedding(text)
-            
-            # Получаем эмбеддинги описаний департаментов
-            department_embeddings = {
-                dept: self.get_embedding(desc)
-                for dept, desc in department_descriptions.items()
-            }
-
-            # Вычисляем косинусное сходство между текстом и описаниями департаментов
-            similarities = {
-                dept: cosine_similarity(text_embedding, dept_embedding)[0][0]
-                for dept, dept_embedding in department_embeddings.items()
-            }
-            
-            for dept, similarity in similarities.items():
-                logger.info(f"Сходство с {dept}: {similarity:.4f}")
-
-            # Выбираем департамент с наибольшим сходством
-            max_similarity = max(similarities.values())
-            if max_similarity < 0.3:  # Пороговое значение для уверенности в классификации
-                logger.warning(f"Недостаточное сходство с любым департаментом (max: {max_similarity:.4f})")
-                return None
-
-            best_department = max(similarities.items(), key=lambda x: x[1])[0]
-            logger.info(f"Выбран департамент: {best_department} (сходство: {max_similarity:.4f})")
-            return best_department
-
+            return self._classify_embedding(cache_key, text_embedding)
         except Exception as e:
             logger.error(f"Ошибка при классификации: {str(e)}", exc_info=True)
             raise HTTPException(
@@ -266,6 +516,106 @@ class HuggingFaceClassifier:
                 detail=f"Ошибка при классификации обращения: {str(e)}"
             )
 
+    def _classify_embedding(self, cache_key: str, text_embedding: torch.Tensor) -> Optional[str]:
+        """
+        Выбор департамента по готовому эмбеддингу текста.
+        Все вычисления идут на устройстве модели; наружу уходят только скаляры
+        """
+        query = F.normalize(text_embedding.reshape(1, -1), dim=1).squeeze(0)
+
+        # Второй уровень кэша: семантическая близость к уже обработанным обращениям
+        if self._cache_depts:
+            cache_similarities = self._cache_embs @ query
+            hit_idx = int(cache_similarities.argmax().item())
+            hit_similarity = float(cache_similarities[hit_idx].item())
+            if hit_similarity >= self.semantic_threshold:
+                department = self._cache_depts[hit_idx]
+                logger.info(f"Кэш (семантическое совпадение, "
+                            f"сходство {hit_similarity:.4f}): {department}")
+                self._cache_result(cache_key, query, department)
+                return department
+
+        # Косинусное сходство со всеми департаментами одним матричным умножением
+        similarities = self.dept_matrix @ query
+
+        for dept, similarity in zip(self.department_names, similarities.tolist()):
+            logger.info(f"Сходство с {dept}: {similarity:.4f}")
+
+        # Выбираем департамент с наибольшим сходством
+        best_idx = int(similarities.argmax().item())
+        max_similarity = float(similarities[best_idx].item())
+        if max_similarity < 0.3:  # Пороговое значение для уверенности в классификации
+            logger.warning(f"Недостаточное сходство с любым департаментом (max: {max_similarity:.4f})")
+            return None
+
+        best_department = self.department_names[best_idx]
+        logger.info(f"Выбран департамент: {best_department} (сходство: {max_similarity:.4f})")
+        self._cache_result(cache_key, query, best_department)
+        return best_department
+
+    def classify_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        Классифицирует несколько обращений, прогоняя тексты, которым нужна
+        модель, одним батчем (микро-батчинг конкурентных запросов)
+        """
+        results: List[Optional[str]] = [None] * len(texts)
+        pending = []  # (позиция, ключ кэша)
+        for i, text in enumerate(texts):
+            cache_key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if cache_key in self._exact_cache:
+                results[i] = self._exact_cache[cache_key]
+                continue
+            department = self._classify_by_keywords(text)
+            if department:
+                results[i] = department
+                continue
+            pending.append((i, cache_key))
+
+        if len(pending) == 1:
+            # Одиночный текст идёт через мемоизированный get_embedding
+            i, cache_key = pending[0]
+            results[i] = self._classify_embedding(cache_key, self.get_embedding(texts[i]))
+        elif pending:
+            # Дубликаты внутри батча эмбеддим один раз
+            unique_texts = list(dict.fromkeys(texts[i] for i, _ in pending))
+            embeddings = self.get_embeddings_batch(unique_texts)
+            embedding_by_text = dict(zip(unique_texts, embeddings))
+            for i, cache_key in pending:
+                results[i] = self._classify_embedding(cache_key, embedding_by_text[texts[i]])
+        return results
+
+def export_onnx(output_path: str = "sbert-int8.onnx",
+                model_name: str = "sberbank-ai/sbert_large_nlu_ru") -> str:
+    """
+    Однократный экспорт модели в ONNX с динамическим int8-квантованием.
+
+    Запускается на этапе сборки:
+        python -c "from models import export_onnx; export_onnx()"
+    Путь к результату затем передаётся приложению через SBERT_ONNX_PATH.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer("пример обращения гражданина", return_tensors="pt")
+
+    fp32_path = output_path.replace("-int8", "")
+    dynamic_axes = {name: {0: "batch", 1: "seq"}
+                    for name in ("input_ids", "attention_mask", "token_type_ids", "last_hidden_state")}
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes=dynamic_axes,
+        opset_version=14
+    )
+    # Динамическое квантование весов до int8 (VNNI на x86)
+    quantize_dynamic(fp32_path, output_path, weight_type=QuantType.QInt8)
+    logger.info(f"ONNX-модель сохранена: {output_path}")
+    return output_path
+
 def get_model(model_name: str, api_key: str) -> BaseModel:
     """
     Фабрика для создания экземпляров моделей